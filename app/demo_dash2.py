@@ -68,7 +68,7 @@ if st.sidebar.button("🔄 Simulate MQTT Session"):
 
     entropy_score = entropy([vocab[i] for i in noisy.tolist()])
     drift = sum(a != b for a, b in zip(secret, regen)) / len(secret)
-    anomaly = anomaly_score(clean_tensor, noisy)
+    anomaly = anomaly_score(clean_tensor, noisy, len(vocab))
     auth_success = secret == regen
 
     st.session_state.sessions.append({
@@ -6,7 +6,7 @@ import torch
 import random
 import string
 import pandas as pd
-import matplotlib.pyplot as plt
+from collections import defaultdict
 from datetime import datetime
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
@@ -14,7 +14,8 @@ from model import (
     train_secret_regenerator,
     evaluate_secret_regenerator,
     add_noise_to_tensor,
-    anomaly_score
+    anomaly_score,
+    tensor_entropy
 )
 
 # ======================
@@ -22,16 +23,18 @@ from model import (
 # ======================
 st.set_page_config("WARL0K Secure MQTT Session Dashboard", layout="wide")
 vocab = list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+_CHAR2IDX = {c: i for i, c in enumerate(vocab)}
+HISTORY_COLUMNS = [
+    "timestamp", "session_id", "secret", "noisy_input", "regenerated",
+    "auth_success", "entropy", "drift", "anomaly"
+]
 
 def to_tensor(text):
-    return torch.tensor([vocab.index(c) for c in text], dtype=torch.long)
+    return torch.tensor([_CHAR2IDX[c] for c in text], dtype=torch.long)
 
-def entropy(s):
-    from collections import Counter
-    from math import log2
-    counts = Counter(s)
-    probs = [v / len(s) for v in counts.values()]
-    return -sum(p * log2(p + 1e-12) for p in probs)
+@st.cache_data(max_entries=4)
+def _history_to_csv(rows_tuple):
+    return pd.DataFrame(list(rows_tuple), columns=HISTORY_COLUMNS).to_csv(index=False).encode("utf-8")
 
 # ======================
 # App State
@@ -39,12 +42,9 @@ def entropy(s):
 if "model" not in st.session_state:
     st.session_state.model = None
 if "sessions" not in st.session_state:
-    st.session_state.sessions = []
-if "history" not in st.session_state:
-    st.session_state.history = pd.DataFrame(columns=[
-        "timestamp", "session_id", "secret", "noisy_input", "regenerated",
-        "auth_success", "entropy", "drift", "anomaly"
-    ])
+    st.session_state.sessions = defaultdict(list)
+if "history_rows" not in st.session_state:
+    st.session_state.history_rows = []
 
 # ======================
 # Sidebar Controls
@@ -62,37 +62,41 @@ if st.sidebar.button("🔄 Simulate Session"):
         progress_bar.progress((i + 1) * 16)
 
     model = train_secret_regenerator(secret, vocab, epochs=60)
+    st.session_state.model = model
     clean_tensor = to_tensor(secret)
     noisy = add_noise_to_tensor(clean_tensor, len(vocab), noise_level=0.3)
-    regen = evaluate_secret_regenerator(model, noisy.unsqueeze(1), vocab)
+    regen, preds = evaluate_secret_regenerator(model, noisy.unsqueeze(1), vocab, return_tensor=True)
+    noisy_str = ''.join([vocab[i] for i in noisy.tolist()])
 
-    entropy_score = entropy([vocab[i] for i in noisy.tolist()])
-    drift = sum(a != b for a, b in zip(secret, regen)) / len(secret)
-    anomaly = anomaly_score(clean_tensor, noisy)
-    auth_success = secret == regen
+    entropy_score = tensor_entropy(noisy, len(vocab))
+    drift = float((preds != clean_tensor).float().mean())
+    anomaly = anomaly_score(clean_tensor, noisy, len(vocab))
+    auth_success = torch.equal(preds, clean_tensor)
 
-    st.session_state.sessions.append({
+    row = {
         "id": session_id,
         "secret": secret,
-        "noisy": ''.join([vocab[i] for i in noisy.tolist()]),
+        "noisy": noisy_str,
         "regen": regen,
         "entropy": entropy_score,
         "drift": drift,
         "anomaly": anomaly,
         "auth_success": auth_success
-    })
+    }
+    for key, value in row.items():
+        st.session_state.sessions[key].append(value)
 
-    st.session_state.history.loc[len(st.session_state.history)] = {
+    st.session_state.history_rows.append({
         "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
         "session_id": session_id,
         "secret": secret,
-        "noisy_input": ''.join([vocab[i] for i in noisy.tolist()]),
+        "noisy_input": noisy_str,
         "regenerated": regen,
         "auth_success": auth_success,
         "entropy": entropy_score,
         "drift": drift,
         "anomaly": anomaly
-    }
+    })
 
     st.sidebar.success("Session complete")
     time.sleep(random.uniform(0.3, 1.0))
@@ -103,7 +107,7 @@ if st.sidebar.button("🔄 Simulate Session"):
 st.sidebar.markdown("---")
 st.sidebar.subheader("📊 Latest Session Stats")
 if st.session_state.sessions:
-    last = st.session_state.sessions[-1]
+    last = {key: values[-1] for key, values in st.session_state.sessions.items()}
     st.sidebar.metric("Entropy", f"{last['entropy']:.3f}")
     st.sidebar.metric("Drift", f"{last['drift']:.2%}")
     st.sidebar.metric("Anomaly Score", f"{last['anomaly']:.3f}")
@@ -117,8 +121,9 @@ else:
 st.title("📡 WARL0K Secure Session Results")
 
 if st.session_state.sessions:
-    selected = st.selectbox("Select Session", options=[s["id"] for s in st.session_state.sessions])
-    sess = next(s for s in st.session_state.sessions if s["id"] == selected)
+    selected = st.selectbox("Select Session", options=st.session_state.sessions["id"])
+    idx = st.session_state.sessions["id"].index(selected)
+    sess = {key: values[idx] for key, values in st.session_state.sessions.items()}
 
     st.subheader(f"Session ID: {selected}")
     col1, col2 = st.columns(2)
@@ -154,22 +159,13 @@ if st.session_state.sessions:
 # ======================
 st.subheader("📈 Trend Over Sessions")
 
-if not st.session_state.history.empty:
-    df = st.session_state.history.copy()
-    fig, ax = plt.subplots(figsize=(8, 4))
-    ax.plot(df["timestamp"], df["entropy"], label="Entropy", marker="o")
-    ax.plot(df["timestamp"], df["drift"], label="Drift", marker="x")
-    ax.plot(df["timestamp"], df["anomaly"], label="Anomaly", marker="s")
-    ax.set_xticklabels(df["timestamp"], rotation=45, ha="right", fontsize=8)
-    ax.legend()
-    ax.set_ylabel("Score")
-    ax.set_title("Entropy / Drift / Anomaly Over Time")
-    st.pyplot(fig)
+if st.session_state.history_rows:
+    df = pd.DataFrame(st.session_state.history_rows, columns=HISTORY_COLUMNS)
+    st.line_chart(df.set_index("timestamp")[["entropy", "drift", "anomaly"]])
 
 # ======================
 # Export
 # ======================
 st.subheader("📤 Export Session Data")
-if st.button("Download CSV"):
-    csv = st.session_state.history.to_csv(index=False).encode("utf-8")
-    st.download_button("📥 Download", csv, "warl0k_sessions.csv", "text/csv")
+rows_key = tuple(tuple(row[c] for c in HISTORY_COLUMNS) for row in st.session_state.history_rows)
+st.download_button("📥 Download CSV", _history_to_csv(rows_key), "warl0k_sessions.csv", "text/csv")
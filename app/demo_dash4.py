@@ -73,7 +73,7 @@ if st.sidebar.button("🚀 Launch Session"):
 
     entropy_score = entropy([vocab[i] for i in noisy.tolist()])
     drift = sum(a != b for a, b in zip(secret, regen)) / len(secret)
-    anomaly = anomaly_score(clean_tensor, noisy)
+    anomaly = anomaly_score(clean_tensor, noisy, len(vocab))
     auth_success = secret == regen
 
     threat_label = "None"
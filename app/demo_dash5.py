@@ -1,44 +1,78 @@
 
 import streamlit as st
+import os
 import uuid
 import time
-import torch
 import random
 import string
 import pandas as pd
-import matplotlib.pyplot as plt
+import torch.multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import defaultdict
 from datetime import datetime
 
 from model import (
     train_secret_regenerator,
-    evaluate_secret_regenerator,
-    add_noise_to_tensor,
-    anomaly_score
+    score_session,
+    simulate_session
 )
 
 st.set_page_config("WARL0K Multi-Client Secure Dashboard", layout="wide")
 vocab = list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+HISTORY_COLUMNS = [
+    "timestamp", "client_id", "device", "session_id", "secret", "noisy_input", "regenerated",
+    "auth_success", "entropy", "drift", "anomaly", "threat_label"
+]
 
-def to_tensor(text):
-    return torch.tensor([vocab.index(c) for c in text], dtype=torch.long)
+def _threat_label(anomaly):
+    if anomaly > 0.6:
+        return "Tampered"
+    if anomaly > 0.3:
+        return "Suspicious"
+    return "None"
+
+def _record_session(result, client_id, device):
+    session_id = str(uuid.uuid4())
+    threat_label = _threat_label(result["anomaly"])
 
-def entropy(s):
-    from collections import Counter
-    from math import log2
-    counts = Counter(s)
-    probs = [v / len(s) for v in counts.values()]
-    return -sum(p * log2(p + 1e-12) for p in probs)
+    row = {
+        "client_id": client_id,
+        "id": session_id,
+        "device": device,
+        "secret": result["secret"],
+        "noisy": result["noisy"],
+        "regen": result["regen"],
+        "entropy": result["entropy"],
+        "drift": result["drift"],
+        "anomaly": result["anomaly"],
+        "auth_success": result["auth_success"],
+        "threat_label": threat_label
+    }
+    for key, value in row.items():
+        st.session_state.sessions[key].append(value)
+
+    st.session_state.history_rows.append({
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "client_id": client_id,
+        "device": device,
+        "session_id": session_id,
+        "secret": result["secret"],
+        "noisy_input": result["noisy"],
+        "regenerated": result["regen"],
+        "auth_success": result["auth_success"],
+        "entropy": result["entropy"],
+        "drift": result["drift"],
+        "anomaly": result["anomaly"],
+        "threat_label": threat_label
+    })
 
 # App State
 if "model" not in st.session_state:
     st.session_state.model = None
 if "sessions" not in st.session_state:
-    st.session_state.sessions = []
-if "history" not in st.session_state:
-    st.session_state.history = pd.DataFrame(columns=[
-        "timestamp", "client_id", "device", "session_id", "secret", "noisy_input", "regenerated",
-        "auth_success", "entropy", "drift", "anomaly", "threat_label"
-    ])
+    st.session_state.sessions = defaultdict(list)
+if "history_rows" not in st.session_state:
+    st.session_state.history_rows = []
 
 # Sidebar Controls
 st.sidebar.title("WARL0K Client Session Simulator")
@@ -46,8 +80,9 @@ device_profile = st.sidebar.selectbox("Device Profile", ["Sensor A", "PLC Gatewa
 client_id = st.sidebar.selectbox("Client ID", ["client-001", "client-002", "client-003", "client-XYZ"])
 tamper = st.sidebar.checkbox("🔴 Simulate Tampered Session")
 
+noise_level = 0.3 if not tamper else 0.9
+
 if st.sidebar.button("🚀 Launch Session"):
-    session_id = str(uuid.uuid4())
     secret = ''.join(random.choices(vocab, k=16))
 
     st.sidebar.write("📡 Training...")
@@ -57,83 +92,52 @@ if st.sidebar.button("🚀 Launch Session"):
         progress_bar.progress((i + 1) * 16)
 
     model = train_secret_regenerator(secret, vocab, epochs=90)
-    clean_tensor = to_tensor(secret)
-    noise_level = 0.3 if not tamper else 0.9
-    noisy = add_noise_to_tensor(clean_tensor, len(vocab), noise_level=noise_level)
-    regen = evaluate_secret_regenerator(model, noisy.unsqueeze(1), vocab)
+    st.session_state.model = model
+    _record_session(score_session(model, secret, vocab, noise_level=noise_level), client_id, device_profile)
 
-    entropy_score = entropy([vocab[i] for i in noisy.tolist()])
-    drift = sum(a != b for a, b in zip(secret, regen)) / len(secret)
-    anomaly = anomaly_score(clean_tensor, noisy)
-    auth_success = secret == regen
-
-    threat_label = "None"
-    if anomaly > 0.6:
-        threat_label = "Tampered"
-    elif anomaly > 0.3:
-        threat_label = "Suspicious"
+    st.sidebar.success("Session completed")
 
-    st.session_state.sessions.append({
-        "client_id": client_id,
-        "id": session_id,
-        "device": device_profile,
-        "secret": secret,
-        "noisy": ''.join([vocab[i] for i in noisy.tolist()]),
-        "regen": regen,
-        "entropy": entropy_score,
-        "drift": drift,
-        "anomaly": anomaly,
-        "auth_success": auth_success,
-        "threat_label": threat_label
-    })
+n_sessions = st.sidebar.number_input("Sessions", min_value=1, max_value=32, value=4)
+if st.sidebar.button(f"🧵 Simulate {n_sessions} Sessions"):
+    secrets = [''.join(random.choices(vocab, k=16)) for _ in range(n_sessions)]
+    workers = max(1, min(n_sessions, (os.cpu_count() or 2) // 2))
 
-    st.session_state.history.loc[len(st.session_state.history)] = {
-        "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-        "client_id": client_id,
-        "device": device_profile,
-        "session_id": session_id,
-        "secret": secret,
-        "noisy_input": ''.join([vocab[i] for i in noisy.tolist()]),
-        "regenerated": regen,
-        "auth_success": auth_success,
-        "entropy": entropy_score,
-        "drift": drift,
-        "anomaly": anomaly,
-        "threat_label": threat_label
-    }
+    st.sidebar.write(f"📡 Training {n_sessions} sessions on {workers} workers...")
+    progress_bar = st.sidebar.progress(0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        futures = [pool.submit(simulate_session, secret, vocab, 90, noise_level) for secret in secrets]
+        for done, future in enumerate(as_completed(futures), start=1):
+            _record_session(future.result(), client_id, device_profile)
+            progress_bar.progress(done / n_sessions)
 
-    st.sidebar.success("Session completed")
+    st.sidebar.success(f"{n_sessions} sessions completed")
 
 # Sidebar Stats + Trend
 st.sidebar.markdown("---")
 st.sidebar.subheader("📊 Last Session Stats")
 if st.session_state.sessions:
-    last = st.session_state.sessions[-1]
+    last = {key: values[-1] for key, values in st.session_state.sessions.items()}
     st.sidebar.metric("Entropy", f"{last['entropy']:.3f}")
     st.sidebar.metric("Drift", f"{last['drift']:.2%}")
     st.sidebar.metric("Anomaly", f"{last['anomaly']:.3f}")
     st.sidebar.success("✅ Auth Success" if last["auth_success"] else "❌ Auth Failed")
     st.sidebar.warning(f"Threat: {last['threat_label']}")
 
-if not st.session_state.history.empty:
+history_df = pd.DataFrame(st.session_state.history_rows, columns=HISTORY_COLUMNS)
+
+if not history_df.empty:
     st.sidebar.markdown("---")
     st.sidebar.caption("📈 Trends Over Time")
-    df = st.session_state.history.copy()
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.plot(df["timestamp"], df["entropy"], label="Entropy", marker="o")
-    ax.plot(df["timestamp"], df["anomaly"], label="Anomaly", marker="x")
-    ax.plot(df["timestamp"], df["drift"], label="Drift", marker="s")
-    ax.set_xticklabels(df["timestamp"], rotation=45, ha="right", fontsize=6)
-    ax.legend(fontsize=6)
-    fig.tight_layout()
-    st.sidebar.pyplot(fig)
+    st.sidebar.line_chart(history_df.set_index("timestamp")[["entropy", "anomaly", "drift"]])
 
 # Main Display
 st.title("📡 WARL0K Multi-Client Session Insights")
 
 if st.session_state.sessions:
-    selected = st.selectbox("Select Session", options=[f"{s['id']} ({s['client_id']})" for s in st.session_state.sessions])
-    sess = next(s for s in st.session_state.sessions if s["id"] in selected)
+    sessions = st.session_state.sessions
+    idx = st.selectbox("Select Session", options=range(len(sessions["id"])),
+                       format_func=lambda i: f"{sessions['id'][i]} ({sessions['client_id'][i]})")
+    sess = {key: values[idx] for key, values in sessions.items()}
 
     st.subheader(f"Session ID: {sess['id']} — Device: {sess['device']} — Client: {sess['client_id']}")
     col1, col2 = st.columns(2)
@@ -167,7 +171,7 @@ if st.session_state.sessions:
 
 # Session Table
 st.subheader("📊 Session Data")
-if not st.session_state.history.empty:
-    st.dataframe(st.session_state.history.sort_values(by="timestamp", ascending=False), use_container_width=True)
+if not history_df.empty:
+    st.dataframe(history_df.iloc[::-1], use_container_width=True)
 else:
     st.info("No session data available yet.")
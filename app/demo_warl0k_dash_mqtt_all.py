@@ -2,6 +2,7 @@
 # demo_warl0k_dash_mqtt_all.py
 
 import streamlit as st
+import os
 import paho.mqtt.client as mqtt
 import uuid
 import threading
@@ -14,6 +15,7 @@ if "response_queue" not in st.session_state:
     st.session_state.response_queue = queue.Queue()
 if "ephemeral_key" not in st.session_state:
     st.session_state.ephemeral_key = AESGCM.generate_key(bit_length=128)
+    st.session_state.aesgcm = AESGCM(st.session_state.ephemeral_key)
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 if "mqtt_client" not in st.session_state:
@@ -27,14 +29,12 @@ TOPIC_SUB = "warl0k/server2"
 TOPIC_PUB = "warl0k/client2"
 
 # --- Encryption/Decryption Helpers ---
-def encrypt_message(key: bytes, plaintext: str):
-    aesgcm = AESGCM(key)
-    nonce = AESGCM.generate_key(bit_length=128)[:12]
+def encrypt_message(aesgcm: AESGCM, plaintext: str):
+    nonce = os.urandom(12)
     ciphertext = aesgcm.encrypt(nonce, plaintext.encode(), None)
     return nonce, ciphertext
 
-def decrypt_message(key: bytes, nonce: bytes, ciphertext: bytes):
-    aesgcm = AESGCM(key)
+def decrypt_message(aesgcm: AESGCM, nonce: bytes, ciphertext: bytes):
     return aesgcm.decrypt(nonce, ciphertext, None).decode()
 
 # --- MQTT Client Callbacks ---
@@ -45,21 +45,22 @@ def client_on_message(client, userdata, msg):
         print(f"[CLIENT] Error pushing message to queue: {e}")
 
 def server_on_message(client, userdata, msg):
-    payload = msg.payload.hex()
-    print(f"[SERVER] Payload: {payload}")
+    payload = msg.payload
+    print(f"[SERVER] Payload: {payload.hex()}")
     try:
-        session_id = bytes.fromhex(payload[:36*2]).decode()
-        nonce = bytes.fromhex(payload[36*2:36*2 + 24])
-        ciphertext = bytes.fromhex(payload[36*2 + 24:])
-        key = st.session_state.ephemeral_key
-        decrypted = decrypt_message(key, nonce, ciphertext)
+        session_id_bytes = payload[:36]
+        nonce = payload[36:48]
+        ciphertext = payload[48:]
+        session_id = session_id_bytes.decode()
+        aesgcm = st.session_state.aesgcm
+        decrypted = decrypt_message(aesgcm, nonce, ciphertext)
         print(f"[SERVER] ✓ AUTH: {decrypted}")
         # Send back confirmation
-        reply_nonce, reply_ct = encrypt_message(key, f"ACK:{decrypted}")
-        response_hex = session_id.encode().hex() + reply_nonce.hex() + reply_ct.hex()
-        # st.session_state.mqtt_client.publish(TOPIC_SUB, bytes.fromhex(response_hex))
+        reply_nonce, reply_ct = encrypt_message(aesgcm, f"ACK:{decrypted}")
+        reply_payload = session_id_bytes + reply_nonce + reply_ct
+        # st.session_state.mqtt_client.publish(TOPIC_SUB, reply_payload)
         if st.session_state.mqtt_client:
-            st.session_state.mqtt_client.publish(TOPIC_PUB, bytes.fromhex(response_hex))
+            st.session_state.mqtt_client.publish(TOPIC_PUB, reply_payload)
             st.success("Message sent.")
         else:
             st.warning("MQTT client not yet connected. Please wait a few seconds and try again.")
@@ -101,11 +102,11 @@ st.sidebar.markdown(f"**Ephemeral Key**: `{st.session_state.ephemeral_key.hex()}
 
 msg_input = st.text_input("Message to send", "AUTH_REQUEST")
 if st.button("Send Message"):
-    nonce, ciphertext = encrypt_message(st.session_state.ephemeral_key, msg_input)
-    payload = st.session_state.session_id.encode().hex() + nonce.hex() + ciphertext.hex()
-    # st.session_state.mqtt_client.publish(TOPIC_PUB, bytes.fromhex(payload))
+    nonce, ciphertext = encrypt_message(st.session_state.aesgcm, msg_input)
+    payload = st.session_state.session_id.encode() + nonce + ciphertext
+    # st.session_state.mqtt_client.publish(TOPIC_PUB, payload)
     if st.session_state.mqtt_client:
-        st.session_state.mqtt_client.publish(TOPIC_PUB, bytes.fromhex(payload))
+        st.session_state.mqtt_client.publish(TOPIC_PUB, payload)
         st.success("Message sent.")
     else:
         st.warning("MQTT client not yet connected. Please wait a few seconds and try again.")
@@ -117,10 +118,10 @@ if not st.session_state.response_queue.empty():
     while not st.session_state.response_queue.empty():
         msg = st.session_state.response_queue.get_nowait()
         try:
-            session_id = bytes.fromhex(msg[:36*2].hex()).decode()
+            session_id = msg[:36].decode()
             nonce = msg[36:48]
             ciphertext = msg[48:]
-            decrypted = decrypt_message(st.session_state.ephemeral_key, nonce, ciphertext)
+            decrypted = decrypt_message(st.session_state.aesgcm, nonce, ciphertext)
             st.code(f"[{session_id}] → {decrypted}", language="text")
         except Exception as e:
             st.error(f"[CLIENT] Failed to decrypt response: {e}")
@@ -58,7 +58,7 @@ if st.sidebar.button("🔄 Simulate MQTT Session"):
 
     entropy_score = entropy([vocab[i] for i in noisy.tolist()])
     drift = sum(a != b for a, b in zip(secret, regen)) / len(secret)
-    anomaly = anomaly_score(clean_tensor, noisy)
+    anomaly = anomaly_score(clean_tensor, noisy, len(vocab))
 
     st.session_state.sessions.append({
         "id": session_id,
@@ -14,9 +14,6 @@ TOPIC_SUB = "warl0k/_client"
 KEY_DIR = "../_session_keys"
 os.makedirs(KEY_DIR, exist_ok=True)
 
-# --- Safe Global State ---
-mqtt_state = {"payload": None}
-
 # --- Generate and Save Session Key ---
 def create_ephemeral_key():
     return AESGCM.generate_key(bit_length=128)
@@ -26,14 +23,12 @@ def save_key(session_id, key_bytes):
         f.write(key_bytes.hex())
 
 # --- Encryption ---
-def encrypt_payload(key, message):
-    aesgcm = AESGCM(key)
+def encrypt_payload(aesgcm, message):
     nonce = os.urandom(12)
     ciphertext = aesgcm.encrypt(nonce, message.encode(), None)
     return nonce, ciphertext
 
-def decrypt_payload(key, nonce, ciphertext):
-    aesgcm = AESGCM(key)
+def decrypt_payload(aesgcm, nonce, ciphertext):
     try:
         return aesgcm.decrypt(nonce, ciphertext, None).decode()
     except Exception as e:
@@ -44,13 +39,21 @@ def on_connect(client, userdata, flags, rc):
     client.subscribe(TOPIC_SUB)
 
 def on_message(client, userdata, msg):
-    mqtt_state["payload"] = msg.payload  # thread-safe buffer
-
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(BROKER, PORT, 60)
-client.loop_start()
+    userdata["payload"] = msg.payload  # thread-safe buffer
+
+# One client (and one network thread) per process, shared across reruns.
+# The payload buffer travels as userdata so callbacks and reruns see the same dict.
+@st.cache_resource(show_spinner=False)
+def get_mqtt_client():
+    mqtt_state = {"payload": None}
+    client = mqtt.Client(userdata=mqtt_state)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(BROKER, PORT, 60)
+    client.loop_start()
+    return client, mqtt_state
+
+client, mqtt_state = get_mqtt_client()
 
 # --- Streamlit UI Setup ---
 st.set_page_config("WARL0K Final Client", layout="wide")
@@ -61,13 +64,14 @@ if "session_id" not in st.session_state:
 if "ephemeral_key" not in st.session_state:
     st.session_state.ephemeral_key = create_ephemeral_key()
     save_key(st.session_state.session_id, st.session_state.ephemeral_key)
+    st.session_state.aesgcm = AESGCM(st.session_state.ephemeral_key)
 if "mqtt_payload" not in st.session_state:
     st.session_state.mqtt_payload = None
 
 # --- Input and Send ---
 message = st.text_input("Message to Encrypt & Send", value="AUTH_REQUEST")
 if st.button("🚀 Send Message"):
-    nonce, ct = encrypt_payload(st.session_state.ephemeral_key, message)
+    nonce, ct = encrypt_payload(st.session_state.aesgcm, message)
     payload = st.session_state.session_id.encode() + nonce + ct
     client.publish(TOPIC_PUB, payload)
     st.success("Message sent with session ID.")
@@ -94,7 +98,7 @@ if st.session_state.mqtt_payload:
     ct_recv = payload[48:]
 
     if session_id_resp == st.session_state.session_id:
-        decrypted = decrypt_payload(st.session_state.ephemeral_key, nonce_recv, ct_recv)
+        decrypted = decrypt_payload(st.session_state.aesgcm, nonce_recv, ct_recv)
         st.subheader("🧠 Decrypted Response")
         st.code(decrypted)
     else:
@@ -1,5 +1,9 @@
 import streamlit as st
 import os
+import queue
+import socket
+import struct
+import threading
 import uuid
 import time
 import paho.mqtt.client as mqtt
@@ -9,14 +13,17 @@ import pandas as pd
 # --- Config ---
 BROKER = "localhost"
 PORT = 1883
-TOPIC_PUB = "warl0k/_server"
-TOPIC_SUB = "warl0k/_client"
+TOPIC_PUB_BATCH = "warl0k/_server/batch"
+BATCH_WINDOW = 0.005
+BATCH_MAX_ITEMS = 32
+MAX_FRAME = 0xFFFF  # largest frame a 2-byte length prefix can carry
+TOPIC_SUB_BATCH = "warl0k/_client/batch"
 KEY_DIR = "../_session_keys"
+SID_LEN = 16  # binary UUID
+FRAME_HEADER = SID_LEN + 12  # session id + nonce
+MAX_MESSAGE = 1024
 os.makedirs(KEY_DIR, exist_ok=True)
 
-# --- Global State ---
-mqtt_state = {"payload": None}
-
 # --- Session Tracking ---
 if "session_log" not in st.session_state:
     st.session_state.session_log = []
@@ -30,47 +37,121 @@ def save_key(session_id, key_bytes):
         f.write(key_bytes.hex())
 
 # --- Encryption / Decryption ---
-def encrypt_payload(key, message):
-    aesgcm = AESGCM(key)
-    nonce = os.urandom(12)
-    ciphertext = aesgcm.encrypt(nonce, message.encode(), None)
-    return nonce, ciphertext
-
-def decrypt_payload(key, nonce, ciphertext, inject_error=False):
-    aesgcm = AESGCM(key)
+# `frame` is the session's reusable send buffer with the session id already in
+# frame[:SID_LEN]; the nonce and ciphertext+tag are written straight into it.
+def encrypt_payload(aesgcm, frame, message):
+    data = message.encode()
+    end = FRAME_HEADER + len(data) + 16
+    if len(frame) < end:
+        frame.extend(bytes(end - len(frame)))
+    with memoryview(frame) as mv:
+        mv[SID_LEN:FRAME_HEADER] = os.urandom(12)
+        aesgcm.encrypt_into(mv[SID_LEN:FRAME_HEADER], data, None, mv[FRAME_HEADER:end])
+        return bytes(mv[:end])
+
+def split_frames(payload):
+    mv = memoryview(payload)
+    frames = []
+    offset = 0
+    while offset + 2 <= len(mv):
+        (size,) = struct.unpack_from(">H", mv, offset)
+        offset += 2
+        if offset + size > len(mv):
+            break
+        frames.append(mv[offset:offset + size])
+        offset += size
+    return frames
+
+def decrypt_payload(aesgcm, nonce, ciphertext, inject_error=False, batched=False):
     try:
         if inject_error:
             tampered = bytearray(ciphertext)
             tampered[0] ^= 0xFF
-            return aesgcm.decrypt(nonce, bytes(tampered), None).decode()
-        return aesgcm.decrypt(nonce, ciphertext, None).decode()
+            ciphertext = bytes(tampered)
+        plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+        # Batched replies carry several length-prefixed ACKs under one tag.
+        if batched:
+            return "\n".join(bytes(frame).decode() for frame in split_frames(plaintext))
+        return plaintext.decode()
     except Exception as e:
         return f"[❌] Decryption failed: {type(e).__name__}: {str(e)}"
 
 # --- MQTT Setup ---
 def on_connect(client, userdata, flags, rc):
-    client.subscribe(TOPIC_SUB)
+    client.subscribe(TOPIC_SUB_BATCH)
 
-def on_message(client, userdata, msg):
-    mqtt_state["payload"] = msg.payload
+def on_socket_open(client, userdata, sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(BROKER, PORT, 60)
-client.loop_start()
+# Flag and payload are stored as one tuple so a reader never pairs one
+# message's flag with another message's payload.
+def on_message(client, userdata, msg):
+    userdata["message"] = (msg.topic == TOPIC_SUB_BATCH, msg.payload)
+
+# --- Publish Batching ---
+# Coalesces frames queued within BATCH_WINDOW (or up to BATCH_MAX_ITEMS) into one
+# MQTT message of 2-byte big-endian length-prefixed frames on TOPIC_PUB_BATCH.
+class PublishBatcher:
+    def __init__(self, client, topic, window=BATCH_WINDOW, max_items=BATCH_MAX_ITEMS):
+        self.client = client
+        self.topic = topic
+        self.window = window
+        self.max_items = max_items
+        self.pending = queue.SimpleQueue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def enqueue(self, payload):
+        if len(payload) > MAX_FRAME:
+            raise ValueError(f"Frame of {len(payload)} bytes exceeds the {MAX_FRAME}-byte batch limit")
+        self.pending.put(payload)
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_items:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            # A failed publish must not kill the thread: the batcher lives for the process.
+            try:
+                self.client.publish(self.topic, b"".join(struct.pack(">H", len(p)) + p for p in batch))
+            except Exception as e:
+                print(f"[❌] Batch publish failed: {type(e).__name__}: {e}")
+
+# One client, network thread and batcher per process, shared across reruns.
+@st.cache_resource(show_spinner=False)
+def get_mqtt_client():
+    mqtt_state = {"message": None}
+    client = mqtt.Client(userdata=mqtt_state)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.on_socket_open = on_socket_open
+    client.connect(BROKER, PORT, 60)
+    client.loop_start()
+    return client, mqtt_state, PublishBatcher(client, TOPIC_PUB_BATCH)
+
+client, mqtt_state, batcher = get_mqtt_client()
 
 # --- Streamlit UI ---
 st.set_page_config("WARL0K Final Client", layout="wide")
 st.title("🔐 WARL0K MQTT Client with Session Locking + Control")
 
 if "session_id" not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())
+    st.session_state.session_id = uuid.uuid4().bytes
 if "ephemeral_key" not in st.session_state:
     st.session_state.ephemeral_key = create_ephemeral_key()
-    save_key(st.session_state.session_id, st.session_state.ephemeral_key)
+    save_key(st.session_state.session_id.hex(), st.session_state.ephemeral_key)
+    st.session_state.aesgcm = AESGCM(st.session_state.ephemeral_key)
+    st.session_state.frame = bytearray(FRAME_HEADER + MAX_MESSAGE + 16)
+    st.session_state.frame[:SID_LEN] = st.session_state.session_id
 if "mqtt_payload" not in st.session_state:
     st.session_state.mqtt_payload = None
+    st.session_state.mqtt_batched = False
 
 st.sidebar.title("🔍 Simulation & Control")
 inject_noise = st.sidebar.checkbox("Inject Decryption Noise (simulate tamper)")
@@ -78,9 +159,8 @@ inject_noise = st.sidebar.checkbox("Inject Decryption Noise (simulate tamper)")
 # --- Stop Server ---
 if st.sidebar.button("🛑 Stop Service"):
     kill_message = "KILL_SERVER"
-    nonce_kill, ct_kill = encrypt_payload(st.session_state.ephemeral_key, kill_message)
-    payload_kill = st.session_state.session_id.encode() + nonce_kill + ct_kill
-    client.publish(TOPIC_PUB, payload_kill)
+    payload_kill = encrypt_payload(st.session_state.aesgcm, st.session_state.frame, kill_message)
+    batcher.enqueue(payload_kill)
     st.warning("🔒 Shutdown signal sent to server.")
     st.code(payload_kill.hex())
     st.session_state.clear()
@@ -89,27 +169,31 @@ if st.sidebar.button("🛑 Stop Service"):
 # --- Input and Send ---
 message = st.text_input("Message to Encrypt & Send", value="AUTH_REQUEST")
 if st.button("🚀 Send Message"):
-    nonce, ct = encrypt_payload(st.session_state.ephemeral_key, message)
-    payload = st.session_state.session_id.encode() + nonce + ct
-    client.publish(TOPIC_PUB, payload)
-    st.success("Message sent with session ID.")
-    st.code(payload.hex())
-    st.session_state.session_log.append({
-        "timestamp": time.strftime("%H:%M:%S"),
-        "session_id": st.session_state.session_id,
-        "message": message,
-        "injected_noise": inject_noise
-    })
+    payload = encrypt_payload(st.session_state.aesgcm, st.session_state.frame, message)
+    try:
+        batcher.enqueue(payload)
+    except ValueError as e:
+        st.error(f"[❌] Message not sent: {e}")
+    else:
+        st.success("Message sent with session ID.")
+        st.code(payload.hex())
+        st.session_state.session_log.append({
+            "timestamp": time.strftime("%H:%M:%S"),
+            "session_id": st.session_state.session_id.hex(),
+            "message": message,
+            "injected_noise": inject_noise
+        })
 
 # --- Display Sidebar Info ---
 st.sidebar.subheader("🆔 Session ID")
-st.sidebar.code(st.session_state.session_id)
+st.sidebar.code(st.session_state.session_id.hex())
 st.sidebar.subheader("🔑 AES Key (hex)")
 st.sidebar.code(st.session_state.ephemeral_key.hex())
 
 # --- Transfer MQTT payload safely ---
-if mqtt_state["payload"] and st.session_state.mqtt_payload is None:
-    st.session_state.mqtt_payload = mqtt_state["payload"]
+latest = mqtt_state["message"]
+if latest and st.session_state.mqtt_payload is None:
+    st.session_state.mqtt_batched, st.session_state.mqtt_payload = latest
 
 # --- Show Server Response ---
 if st.session_state.mqtt_payload:
@@ -117,16 +201,17 @@ if st.session_state.mqtt_payload:
     payload = st.session_state.mqtt_payload
     st.code(payload.hex())
 
-    session_id_resp = payload[:36].decode()
-    nonce_recv = payload[36:48]
-    ct_recv = payload[48:]
+    session_id_resp = payload[:SID_LEN]
+    nonce_recv = payload[SID_LEN:FRAME_HEADER]
+    ct_recv = payload[FRAME_HEADER:]
 
     if session_id_resp == st.session_state.session_id:
         decrypted = decrypt_payload(
-            st.session_state.ephemeral_key,
+            st.session_state.aesgcm,
             nonce_recv,
             ct_recv,
-            inject_error=inject_noise
+            inject_error=inject_noise,
+            batched=st.session_state.mqtt_batched
         )
         st.subheader("🧠 Decrypted Response")
         st.code(decrypted)
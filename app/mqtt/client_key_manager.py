@@ -17,12 +17,23 @@ def save_key(session_id, key_bytes):
     with open(os.path.join(KEY_DIR, f"{session_id}.key"), "w") as f:
         f.write(key_bytes.hex())
 
+# One open() instead of exists() + open(); O_NOATIME (Linux) skips the atime
+# write on every read, but is refused with EPERM for files we don't own.
+KEY_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_NOATIME", 0)
+
 def load_key(session_id):
     key_path = os.path.join(KEY_DIR, f"{session_id}.key")
-    if not os.path.exists(key_path):
-        raise FileNotFoundError(f"Key not found for session {session_id}")
-    with open(key_path, "r") as f:
-        return bytes.fromhex(f.read())
+    try:
+        try:
+            fd = os.open(key_path, KEY_OPEN_FLAGS)
+        except PermissionError:
+            fd = os.open(key_path, os.O_RDONLY)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Key not found for session {session_id}") from None
+    try:
+        return bytes.fromhex(os.read(fd, 64).decode())
+    finally:
+        os.close(fd)
 
 def list_sessions():
     return [f.replace(".key", "") for f in os.listdir(KEY_DIR) if f.endswith(".key")]
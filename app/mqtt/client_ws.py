@@ -0,0 +1,174 @@
+import os
+import socket
+import struct
+import uuid
+import asyncio
+import paho.mqtt.client as mqtt
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse
+import uvicorn
+
+# --- Config ---
+BROKER = "localhost"
+PORT = 1883
+# Binary 16-byte session ids are only understood on the batch topics.
+TOPIC_PUB = "warl0k/_server/batch"
+TOPIC_SUB = "warl0k/_client/batch"
+KEY_DIR = "../_session_keys"
+SID_LEN = 16  # binary UUID
+FRAME_HEADER = SID_LEN + 12  # session id + nonce
+MAX_MESSAGE = 1024
+MAX_FRAME = 0xFFFF  # largest frame a 2-byte length prefix can carry
+HTTP_HOST = "0.0.0.0"
+HTTP_PORT = 8000
+os.makedirs(KEY_DIR, exist_ok=True)
+
+# --- Key Management ---
+def create_ephemeral_key():
+    return AESGCM.generate_key(bit_length=128)
+
+def save_key(session_id, key_bytes):
+    with open(os.path.join(KEY_DIR, f"{session_id}.key"), "w") as f:
+        f.write(key_bytes.hex())
+
+# --- Encryption / Decryption ---
+def encrypt_payload(aesgcm, frame, message):
+    data = message.encode()
+    end = FRAME_HEADER + len(data) + 16
+    if len(frame) < end:
+        frame.extend(bytes(end - len(frame)))
+    with memoryview(frame) as mv:
+        mv[SID_LEN:FRAME_HEADER] = os.urandom(12)
+        aesgcm.encrypt_into(mv[SID_LEN:FRAME_HEADER], data, None, mv[FRAME_HEADER:end])
+        return bytes(mv[:end])
+
+# Batched messages are a run of 2-byte big-endian length-prefixed frames.
+def split_frames(payload):
+    mv = memoryview(payload)
+    frames = []
+    offset = 0
+    while offset + 2 <= len(mv):
+        (size,) = struct.unpack_from(">H", mv, offset)
+        offset += 2
+        if offset + size > len(mv):
+            break
+        frames.append(mv[offset:offset + size])
+        offset += size
+    return frames
+
+def join_frames(frames):
+    return b"".join(struct.pack(">H", len(frame)) + frame for frame in frames)
+
+def decrypt_payload(aesgcm, nonce, ciphertext, inject_error=False):
+    try:
+        if inject_error:
+            tampered = bytearray(ciphertext)
+            tampered[0] ^= 0xFF
+            ciphertext = bytes(tampered)
+        plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+        return "\n".join(bytes(frame).decode() for frame in split_frames(plaintext))
+    except Exception as e:
+        return f"[❌] Decryption failed: {type(e).__name__}: {str(e)}"
+
+# --- Open Sessions (one per browser socket), keyed by wire session id ---
+SESSIONS = {}
+
+# --- MQTT Setup ---
+def on_connect(client, userdata, flags, rc):
+    client.subscribe(TOPIC_SUB)
+
+def on_socket_open(client, userdata, sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+# Runs on the paho thread; the reply is handed to the session's event loop.
+def on_message(client, userdata, msg):
+    payload = msg.payload
+    session = SESSIONS.get(payload[:SID_LEN])
+    if session is None:
+        return
+    decrypted = decrypt_payload(session["aesgcm"], payload[SID_LEN:FRAME_HEADER], payload[FRAME_HEADER:], session["inject_error"])
+    reply = {"received": payload.hex(), "response": decrypted}
+    asyncio.run_coroutine_threadsafe(session["ws"].send_json(reply), session["loop"])
+
+# One paho client for the process, not one per request.
+client = mqtt.Client()
+client.on_connect = on_connect
+client.on_message = on_message
+client.on_socket_open = on_socket_open
+client.connect(BROKER, PORT, 60)
+client.loop_start()
+
+# --- Web UI ---
+PAGE = """<!doctype html>
+<html>
+<head><meta charset="utf-8"><title>WARL0K Client</title></head>
+<body style="font-family: monospace">
+<h2>🔐 WARL0K MQTT Client</h2>
+<p>Session ID: <span id="sid">connecting...</span></p>
+<input id="msg" value="AUTH_REQUEST" size="40">
+<label><input id="noise" type="checkbox"> Inject Decryption Noise</label>
+<button id="send">🚀 Send Message</button>
+<button id="kill">🛑 Stop Service</button>
+<h3>📤 Sent</h3><pre id="sent"></pre>
+<h3>📥 Received Payload</h3><pre id="received"></pre>
+<h3>🧠 Decrypted Response</h3><pre id="response"></pre>
+<script>
+const ws = new WebSocket(`ws://${location.host}/ws`);
+const $ = (id) => document.getElementById(id);
+ws.onmessage = (event) => {
+  const data = JSON.parse(event.data);
+  for (const key of ["sid", "sent", "received", "response"]) {
+    if (key in data) $(key).textContent = data[key];
+  }
+};
+const send = (message) => ws.send(JSON.stringify({message, inject_error: $("noise").checked}));
+$("send").onclick = () => send($("msg").value);
+$("kill").onclick = () => send("KILL_SERVER");
+</script>
+</body>
+</html>
+"""
+
+app = FastAPI()
+
+@app.get("/")
+async def index():
+    return HTMLResponse(PAGE)
+
+@app.websocket("/ws")
+async def session_socket(ws: WebSocket):
+    await ws.accept()
+    sid = uuid.uuid4().bytes
+    key = create_ephemeral_key()
+    save_key(sid.hex(), key)
+    frame = bytearray(FRAME_HEADER + MAX_MESSAGE + 16)
+    frame[:SID_LEN] = sid
+    session = {
+        "ws": ws,
+        "loop": asyncio.get_running_loop(),
+        "aesgcm": AESGCM(key),
+        "inject_error": False,
+    }
+    SESSIONS[sid] = session
+    await ws.send_json({"sid": sid.hex()})
+    try:
+        while True:
+            request = await ws.receive_json()
+            session["inject_error"] = bool(request.get("inject_error"))
+            payload = encrypt_payload(session["aesgcm"], frame, request["message"])
+            if len(payload) > MAX_FRAME:
+                await ws.send_json({"sent": "[❌] Message too large to send."})
+                continue
+            client.publish(TOPIC_PUB, join_frames([payload]))
+            await ws.send_json({"sent": payload.hex()})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        SESSIONS.pop(sid, None)
+
+# --- Run ---
+# Single worker: the paho client and session table live in this process.
+# loop="auto" picks uvloop when it is installed.
+if __name__ == "__main__":
+    uvicorn.run(app, host=HTTP_HOST, port=HTTP_PORT, workers=1, loop="auto")
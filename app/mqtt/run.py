@@ -1,5 +1,6 @@
 import os
 import shutil
+import socket
 import subprocess
 import time
 
@@ -25,22 +26,56 @@ def check_exec(cmd):
 # assert os.path.exists("client_dash_all_data_log.py"), "❌ client_dash_all_data_log.py not found"
 
 # --- Safe subprocess launcher ---
-def safe_launch(cmd_list, log_file):
+# close_fds=False plus an absolute executable path lets subprocess use
+# posix_spawn (vfork) instead of fork+exec walking the whole fd table.
+def safe_launch(cmd_list, log_file, env=None):
     try:
+        executable = shutil.which(cmd_list[0]) or cmd_list[0]
         subprocess.Popen(
-            cmd_list,
+            [executable] + cmd_list[1:],
             stdout=open(log_file, "w"),
-            stderr=subprocess.STDOUT
+            stderr=subprocess.STDOUT,
+            close_fds=False,
+            env=env
         )
         print(f"[✓] Launched: {' '.join(cmd_list)}")
     except FileNotFoundError as e:
         print(f"[❌] Launch failed: {e}")
 
-# --- Launch Mosquitto (optional, comment if cloud already runs it) ---
-safe_launch(["/snap/bin/mosquitto_pub", "-c", "/etc/mosquitto/mosquitto.conf"], "logs/mosquitto.log")
+# --- Broker health check ---
+def broker_up(host="localhost", port=1883):
+    s = socket.socket()
+    s.settimeout(1)
+    try:
+        s.connect((host, port))
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+def wait_for_broker(timeout=10, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if broker_up():
+            return True
+        time.sleep(interval)
+    return False
+
+# --- Launch Mosquitto (skipped if a broker is already listening) ---
+if broker_up():
+    print("[✓] MQTT broker already running on localhost:1883")
+else:
+    safe_launch(["mosquitto", "-c", "/etc/mosquitto/mosquitto.conf"], "logs/mosquitto.log")
+    # The server exits if its first connect is refused, so wait for the listener.
+    if wait_for_broker():
+        print("[✓] MQTT broker is accepting connections on localhost:1883")
+    else:
+        print("[❌] MQTT broker did not come up on localhost:1883; check logs/mosquitto.log")
 
 # --- Launch WARL0K Server ---
-safe_launch(["python3", "server_dash_log.py"], "logs/server.log")
+# Two malloc arenas keep the crypto threads from fragmenting RSS across many arenas.
+safe_launch(["python3", "server_dash_log.py"], "logs/server.log", env={**os.environ, "MALLOC_ARENA_MAX": "2"})
 
 # --- Delay and Launch Client Dashboard ---
 time.sleep(2)
@@ -12,10 +12,12 @@ mkdir -p ../_session_keys
 
 # Start the WARL0K server process
 echo "Starting WARL0K server..."
-nohup python3 server_dash_log.py > logs/server.log 2>&1 &
+MALLOC_ARENA_MAX=2 nohup python3 server_dash_log.py > logs/server.log 2>&1 &
 
 # Start the WARL0K client dashboard (Streamlit)
 echo "Starting WARL0K client dashboard..."
 #nohup streamlit run client_dash_all_data.py > logs/client_dashboard.log 2>&1 &
 nohup streamlit run client_dash_all_data_log.py > logs/client_dashboard.log 2>&1 &
+# Lightweight WebSocket client (FastAPI) instead of the Streamlit dashboard
+#nohup python3 client_ws.py > logs/client_ws.log 2>&1 &
 echo "All services launched. Check logs/ for output."
@@ -1,5 +1,7 @@
 
 import os
+import socket
+from collections import OrderedDict
 import paho.mqtt.client as mqtt
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
@@ -8,14 +10,40 @@ PORT = 1883
 TOPIC_SUB = "warl0k/_server"
 TOPIC_PUB = "warl0k/_client"
 KEY_DIR = "../app/_session_keys"
+SESSION_CACHE_SIZE = 1024
 
 # --- Load Key by Session ID ---
+# One open() instead of exists() + open(); O_NOATIME (Linux) skips the atime
+# write on every read, but is refused with EPERM for files we don't own.
+KEY_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_NOATIME", 0)
+
 def load_key(session_id):
     key_path = os.path.join(KEY_DIR, f"{session_id}.key")
-    if not os.path.exists(key_path):
-        raise FileNotFoundError(f"Key not found for session {session_id}")
-    with open(key_path, "r") as f:
-        return bytes.fromhex(f.read())
+    try:
+        try:
+            fd = os.open(key_path, KEY_OPEN_FLAGS)
+        except PermissionError:
+            fd = os.open(key_path, os.O_RDONLY)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Key not found for session {session_id}") from None
+    try:
+        return bytes.fromhex(os.read(fd, 64).decode())
+    finally:
+        os.close(fd)
+
+# --- Per-Session Cipher Cache (LRU) ---
+SESSION_CIPHERS = OrderedDict()
+
+def load_cipher(session_id):
+    aesgcm = SESSION_CIPHERS.get(session_id)
+    if aesgcm is not None:
+        SESSION_CIPHERS.move_to_end(session_id)
+        return aesgcm
+    aesgcm = AESGCM(load_key(session_id))
+    SESSION_CIPHERS[session_id] = aesgcm
+    if len(SESSION_CIPHERS) > SESSION_CACHE_SIZE:
+        SESSION_CIPHERS.popitem(last=False)
+    return aesgcm
 
 # --- MQTT Handlers ---
 def on_connect(client, userdata, flags, rc):
@@ -23,6 +51,9 @@ def on_connect(client, userdata, flags, rc):
     client.subscribe(TOPIC_SUB)
     print(f"[MQTT] Subscribed to {TOPIC_SUB}")
 
+def on_socket_open(client, userdata, sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
 def on_message(client, userdata, msg):
     print(f"[MQTT] Message received on {msg.topic}")
     payload = msg.payload
@@ -41,8 +72,7 @@ def on_message(client, userdata, msg):
         print(f"[NONCE] {nonce.hex()}")
         print(f"[CIPHERTEXT] {ciphertext.hex()}")
 
-        key = load_key(session_id)
-        aesgcm = AESGCM(key)
+        aesgcm = load_cipher(session_id)
         decrypted = aesgcm.decrypt(nonce, ciphertext, None).decode()
 
         print(f"[✓] Decrypted Message: {decrypted}")
@@ -62,5 +92,6 @@ def on_message(client, userdata, msg):
 client = mqtt.Client()
 client.on_connect = on_connect
 client.on_message = on_message
+client.on_socket_open = on_socket_open
 client.connect(BROKER, PORT, 60)
 client.loop_forever()
@@ -1,5 +1,13 @@
 import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import logging.handlers
+import queue
 import paho.mqtt.client as mqtt
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
@@ -7,77 +15,272 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 BROKER = "localhost"
 PORT = 1883
 TOPIC_SUB = "warl0k/_server"
+TOPIC_SUB_BATCH = "warl0k/_server/batch"
 TOPIC_PUB = "warl0k/_client"
+TOPIC_PUB_BATCH = "warl0k/_client/batch"
 KEY_DIR = "../_session_keys"
+SESSION_CACHE_SIZE = 1024
+CRYPTO_WORKERS = 4
+NET_CPU = 0  # paho network thread; crypto workers get the remaining cores
+LEGACY_SID_LEN = 36  # ASCII UUID, single frames on TOPIC_SUB
+SID_LEN = 16  # binary UUID, frames on TOPIC_SUB_BATCH
+NONCE_LEN = 12
+NONCE_SALT_LEN = 8  # random prefix; the remaining 4 bytes are the counter
+NONCE_COUNTER_MAX = 1 << (8 * (NONCE_LEN - NONCE_SALT_LEN))
+REPLY_BUFFER_SIZE = 1024
+REPLY_BUFFER_POOL = 32
 LOG_FILE = "logs/server.log"
+LOG_LEVEL = logging.WARNING  # DEBUG also renders payload/nonce/ciphertext hex
 
 # --- Setup Logging ---
+# Handlers only enqueue records; file formatting and I/O happen on the
+# listener thread, so the message path never waits on the handler lock.
 os.makedirs("logs", exist_ok=True)
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
+file_handler = logging.FileHandler(LOG_FILE)
+file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+log_listener.start()
+
+logger = logging.getLogger("warl0k.server")
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
-logging.info("🔐 WARL0K Server initializing...")
+logger.info("🔐 WARL0K Server initializing...")
 
 # --- Load Key by Session ID ---
+# One open() instead of exists() + open(); O_NOATIME (Linux) skips the atime
+# write on every read, but is refused with EPERM for files we don't own.
+KEY_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_NOATIME", 0)
+
 def load_key(session_id):
     key_path = os.path.join(KEY_DIR, f"{session_id}.key")
-    if not os.path.exists(key_path):
-        raise FileNotFoundError(f"Key not found for session {session_id}")
-    with open(key_path, "r") as f:
-        return bytes.fromhex(f.read())
+    try:
+        try:
+            fd = os.open(key_path, KEY_OPEN_FLAGS)
+        except PermissionError:
+            fd = os.open(key_path, os.O_RDONLY)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Key not found for session {session_id}") from None
+    try:
+        return bytes.fromhex(os.read(fd, 64).decode())
+    finally:
+        os.close(fd)
+
+# --- Per-Session Cache (LRU) ---
+class Session:
+    __slots__ = ("sid", "aesgcm", "salt", "counter")
+
+    def __init__(self, sid, aesgcm):
+        self.sid = sid
+        self.aesgcm = aesgcm
+        self.salt = os.urandom(NONCE_SALT_LEN)
+        self.counter = 0
+
+SESSIONS = OrderedDict()
+SESSION_LOCK = threading.Lock()
+
+# Keyed by the raw session id from the wire. Key files are named by the ASCII
+# UUID for legacy 36-byte ids and by the hex of 16-byte binary ids.
+def load_session(sid):
+    with SESSION_LOCK:
+        session = SESSIONS.get(sid)
+        if session is not None:
+            SESSIONS.move_to_end(sid)
+            return session
+    key_name = sid.hex() if len(sid) == SID_LEN else sid.decode("ascii")
+    session = Session(sid, AESGCM(load_key(key_name)))
+    with SESSION_LOCK:
+        session = SESSIONS.setdefault(sid, session)
+        if len(SESSIONS) > SESSION_CACHE_SIZE:
+            SESSIONS.popitem(last=False)
+    return session
+
+# GCM nonce: 8-byte random prefix + 4-byte message counter. A session that is
+# evicted from the LRU (or outlives a restart) comes back under the same key
+# with a fresh prefix and counter 0, so the prefix must be wide enough that
+# random prefixes do not collide; 64 bits keeps the birthday bound far off.
+# An exhausted counter draws a new prefix rather than wrapping.
+def next_nonce(session):
+    with SESSION_LOCK:
+        if session.counter == NONCE_COUNTER_MAX:
+            session.salt = os.urandom(NONCE_SALT_LEN)
+            session.counter = 0
+        salt = session.salt
+        counter = session.counter
+        session.counter = counter + 1
+    return salt + counter.to_bytes(NONCE_LEN - NONCE_SALT_LEN, "big")
+
+# --- Reply Buffer Pool ---
+# Replies are assembled in recycled bytearrays instead of fresh sid + nonce + ct
+# concatenations; deque append/popleft are atomic, so no lock is needed.
+class BufferPool:
+    def __init__(self, size, count):
+        self.size = size
+        self.count = count
+        self.free = deque(bytearray(size) for _ in range(count))
+
+    def acquire(self):
+        try:
+            return self.free.popleft()
+        except IndexError:
+            return bytearray(self.size)
+
+    def release(self, buf):
+        if len(self.free) < self.count:
+            self.free.append(buf)
+
+reply_buffers = BufferPool(REPLY_BUFFER_SIZE, REPLY_BUFFER_POOL)
+
+def seal_reply(session, plaintext):
+    sid_len = len(session.sid)
+    header = sid_len + NONCE_LEN
+    end = header + len(plaintext) + 16
+    buf = reply_buffers.acquire()
+    try:
+        if len(buf) < end:
+            buf.extend(bytes(end - len(buf)))
+        with memoryview(buf) as mv:
+            mv[:sid_len] = session.sid
+            mv[sid_len:header] = next_nonce(session)
+            session.aesgcm.encrypt_into(mv[sid_len:header], plaintext, None, mv[header:end])
+            return bytes(mv[:end])
+    finally:
+        reply_buffers.release(buf)
+
+# --- CPU Pinning (Linux only; skipped on single-core hosts) ---
+AVAILABLE_CPUS = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set()
+PIN_THREADS = NET_CPU in AVAILABLE_CPUS and len(AVAILABLE_CPUS) > 1
+WORKER_CPUS = AVAILABLE_CPUS - {NET_CPU}
+
+# On Linux pid 0 means the calling thread, so each thread pins itself.
+def pin_thread(cpus):
+    if PIN_THREADS:
+        os.sched_setaffinity(0, cpus)
+
+# --- Crypto Worker Pool ---
+# AES work runs off the paho network thread so it keeps reading packets;
+# pyca releases the GIL inside OpenSSL, so the workers run in parallel.
+crypto_pool = ThreadPoolExecutor(
+    max_workers=CRYPTO_WORKERS,
+    thread_name_prefix="warl0k-crypto",
+    initializer=pin_thread,
+    initargs=(WORKER_CPUS,),
+)
 
 # --- MQTT Handlers ---
 def on_connect(client, userdata, flags, rc):
-    logging.info(f"[MQTT] Connected with result code {rc}")
-    client.subscribe(TOPIC_SUB)
-    logging.info(f"[MQTT] Subscribed to {TOPIC_SUB}")
+    pin_thread({NET_CPU})
+    logger.info(f"[MQTT] Connected with result code {rc}")
+    client.subscribe([(TOPIC_SUB, 0), (TOPIC_SUB_BATCH, 0)])
+    logger.info(f"[MQTT] Subscribed to {TOPIC_SUB}, {TOPIC_SUB_BATCH}")
+
+# WARL0K frames are tiny request/response packets; don't let Nagle hold them back.
+def on_socket_open(client, userdata, sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
 def on_message(client, userdata, msg):
-    logging.info(f"[MQTT] Message received on topic '{msg.topic}'")
-    payload = msg.payload
-    logging.info(f"[PAYLOAD] (hex): {payload.hex()} (len: {len(payload)})")
+    logger.info("[MQTT] Message received on topic '%s'", msg.topic)
+    if msg.topic == TOPIC_SUB_BATCH:
+        crypto_pool.submit(handle_batch, client, msg.payload)
+    else:
+        crypto_pool.submit(handle_payload, client, msg.payload)
 
-    if len(payload) < 48:
-        logging.warning("Payload too short: cannot extract session ID + nonce + ciphertext.")
-        return
+# Batched messages are a run of 2-byte big-endian length-prefixed frames.
+def split_frames(payload):
+    mv = memoryview(payload)
+    frames = []
+    offset = 0
+    while offset + 2 <= len(mv):
+        (size,) = struct.unpack_from(">H", mv, offset)
+        offset += 2
+        if offset + size > len(mv):
+            logger.warning("Truncated frame in batched payload; dropping remainder.")
+            break
+        frames.append(mv[offset:offset + size])
+        offset += size
+    return frames
 
-    try:
-        session_id = payload[:36].decode()
-        nonce = payload[36:48]
-        ciphertext = payload[48:]
+def join_frames(frames):
+    return b"".join(struct.pack(">H", len(frame)) + frame for frame in frames)
 
-        logging.info(f"[SESSION] ID: {session_id}")
-        logging.info(f"[NONCE] {nonce.hex()}")
-        logging.info(f"[CIPHERTEXT] {ciphertext.hex()}")
+def open_frame(payload, sid_len):
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("[PAYLOAD] (hex): %s (len: %d)", payload.hex(), len(payload))
 
-        key = load_key(session_id)
-        aesgcm = AESGCM(key)
-        decrypted = aesgcm.decrypt(nonce, ciphertext, None).decode()
+    header = sid_len + NONCE_LEN
+    if len(payload) < header:
+        logger.warning("Payload too short: cannot extract session ID + nonce + ciphertext.")
+        return None
 
-        logging.info(f"[✓] Decrypted Message: {decrypted}")
+    mv = memoryview(payload)
+    sid = bytes(mv[:sid_len])
+    nonce = mv[sid_len:header]
+    ciphertext = mv[header:]
+
+    if debug:
+        logger.debug("[SESSION] ID: %s", sid.hex())
+        logger.debug("[NONCE] %s", nonce.hex())
+        logger.debug("[CIPHERTEXT] %s", ciphertext.hex())
+
+    session = load_session(sid)
+    decrypted = session.aesgcm.decrypt(nonce, ciphertext, None).decode()
+
+    logger.info("[✓] Decrypted Message: %s", decrypted)
+    return sid, session, decrypted
+
+def handle_payload(client, payload):
+    try:
+        opened = open_frame(payload, LEGACY_SID_LEN)
+        if opened is None:
+            return
+        sid, session, decrypted = opened
 
         # Reply
         response = f"ACK:{decrypted}"
-        nonce_out = os.urandom(12)
-        ct_out = aesgcm.encrypt(nonce_out, response.encode(), None)
-        response_payload = session_id.encode() + nonce_out + ct_out
+        response_payload = seal_reply(session, response.encode())
 
         client.publish(TOPIC_PUB, response_payload)
-        logging.info(f"[→] Encrypted response sent to {TOPIC_PUB}")
+        logger.info("[→] Encrypted response sent to %s", TOPIC_PUB)
 
     except Exception as e:
-        logging.error(f"[❌] Decryption failed: {type(e).__name__} - {e}")
+        logger.error("[❌] Decryption failed: %s - %s", type(e).__name__, e)
+
+# Replies to a batch are grouped per session and sealed with a single GCM call,
+# so OpenSSL processes one multi-block buffer instead of many one-block ones.
+def handle_batch(client, payload):
+    replies = {}
+    for frame in split_frames(payload):
+        try:
+            opened = open_frame(frame, SID_LEN)
+        except Exception as e:
+            logger.error("[❌] Decryption failed: %s - %s", type(e).__name__, e)
+            continue
+        if opened is None:
+            continue
+        sid, session, decrypted = opened
+        replies.setdefault(sid, (session, []))[1].append(f"ACK:{decrypted}".encode())
+
+    for sid, (session, responses) in replies.items():
+        client.publish(TOPIC_PUB_BATCH, seal_reply(session, join_frames(responses)))
+        logger.info("[→] %d encrypted responses sent to %s", len(responses), TOPIC_PUB_BATCH)
 
 # --- Run MQTT Server Loop ---
 try:
     client = mqtt.Client()
     client.on_connect = on_connect
     client.on_message = on_message
+    client.on_socket_open = on_socket_open
     client.connect(BROKER, PORT, 60)
-    logging.info("MQTT client initialized, entering loop.")
-    client.loop_forever()
+    logger.info("MQTT client initialized, starting network thread.")
+    client.loop_start()
+    while True:
+        time.sleep(3600)
+except KeyboardInterrupt:
+    client.loop_stop()
+    crypto_pool.shutdown()
 except Exception as e:
-    logging.critical(f"[FATAL] Server crashed: {type(e).__name__} - {e}")
+    logger.critical(f"[FATAL] Server crashed: {type(e).__name__} - {e}")
+finally:
+    log_listener.stop()